@@ -1,16 +1,20 @@
 import streamlit as st
 import time
+import asyncio
+import json
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable
 import traceback
 
 from config import AppConfig
 from utils import (
     initialize_llamacloud_index,
-    initialize_openai_llm,
-    search_knowledge_base,
+    prepare_search,
     structure_response,
     format_sources,
+    format_source_markdown,
+    calculate_source_stats,
+    get_api_keys,
     validate_query
 )
 
@@ -25,8 +29,7 @@ st.set_page_config(
 def check_secrets():
     """Check if required API keys are available in Streamlit secrets"""
     try:
-        openai_key = st.secrets["api_keys"]["openai_api_key"]
-        llama_key = st.secrets["api_keys"]["llamacloud_api_key"]
+        get_api_keys()
         return True
     except KeyError as e:
         st.error(f"❌ Missing API key: {e}")
@@ -80,6 +83,13 @@ def main():
             help="0.0 = precise answers, 1.0 = creative answers"
         )
         
+        # Retrieval-only answers
+        fast_mode = st.checkbox(
+            "⚡ Fast mode",
+            value=False,
+            help="Show the most relevant fragments without AI analysis (much faster)"
+        )
+        
         st.markdown("---")
         st.markdown("**💡 Tip:** Ask specific questions for better results")
         
@@ -141,41 +151,50 @@ def main():
             try:
                 # Initialize components
                 start_time = time.time()
+                st.session_state.pop('last_error', None)
+                st.session_state.pop('last_traceback', None)
                 
                 # Initialize LlamaCloud index
                 index = initialize_llamacloud_index()
                 
-                # Search knowledge base
-                search_results = search_knowledge_base(index, query, top_k=num_docs)
+                # Search knowledge base while initializing OpenAI
+                search_results, llm = asyncio.run(
+                    prepare_search(index, query, top_k=num_docs, temperature=temperature, fast_mode=fast_mode)
+                )
                 
                 if not search_results:
+                    st.session_state.pop('last_result', None)
                     st.warning("🤷‍♂️ No results found for your query. Try rephrasing your question.")
                     return
                 
-                # Initialize OpenAI
-                llm = initialize_openai_llm(temperature=temperature)
-                
-                # Structure response
-                with st.spinner("🤖 Analyzing and structuring response..."):
-                    structured_response = structure_response(llm, query, search_results)
-                
-                end_time = time.time()
-                processing_time = end_time - start_time
+                # Stream structured response into the results view
+                response_stream = structure_response(llm, query, search_results, fast_mode=fast_mode)
                 
                 # Display results
-                display_results(structured_response, search_results, processing_time, query)
+                display_results(response_stream, search_results, start_time, query, fast_mode=fast_mode)
                 
             except Exception as e:
-                st.error(f"❌ An error occurred: {str(e)}")
+                st.session_state.pop('last_result', None)
+                error_text = str(e)
+                st.error(f"❌ An error occurred: {error_text}")
                 st.error("Please check your API key settings and try again.")
                 
-                # Show error details in debug mode
-                if st.checkbox("Show error details"):
-                    st.code(traceback.format_exc())
+                # Keep details so they survive the rerun triggered by the checkbox
+                st.session_state.last_error = error_text
+                st.session_state.last_traceback = traceback.format_exc()
     
     elif search_button and not query.strip():
         st.warning("⚠️ Please enter a question to search.")
     
+    # Redraw the last result on reruns from other widgets (export, checkboxes, sliders)
+    elif 'last_result' in st.session_state:
+        display_cached_results(st.session_state.last_result)
+    
+    # Show error details in debug mode
+    if 'last_traceback' in st.session_state and st.checkbox("Show error details"):
+        st.markdown(f"**Last error:** {st.session_state.last_error}")
+        st.code(st.session_state.last_traceback)
+    
     # Footer
     st.markdown("---")
     col1, col2, col3 = st.columns(3)
@@ -186,36 +205,87 @@ def main():
     with col3:
         st.markdown("📚 **Database:** Arxiv 2024-2025")
 
-def display_results(response: str, search_results: List, processing_time: float, query: str):
-    """Display search results"""
+def answer_html(response: str) -> str:
+    """Wrap response text in the answer container markup"""
+    return (
+        f'<div style="background-color: #f0f2f6; padding: 20px; border-radius: 10px; border-left: 5px solid #1f77b4;">'
+        f'{response}'
+        f'</div>'
+    )
+
+def render_answer(target, response: str, fast_mode: bool = False):
+    """Render the answer into a Streamlit container or placeholder"""
+    # Fast-mode answers are raw paper fragments: plain Markdown keeps text like `p<0.05` intact
+    if fast_mode:
+        target.markdown(response)
+    else:
+        target.markdown(answer_html(response), unsafe_allow_html=True)
+
+def display_results(
+    response_stream: Iterable[str],
+    search_results: List,
+    start_time: float,
+    query: str,
+    fast_mode: bool = False
+):
+    """Display search results, streaming the answer as it is generated"""
     
     # Main response
     st.markdown("## 💬 Answer")
     
-    # Response in beautiful container
+    # Response in beautiful container, filled progressively as tokens arrive
     with st.container():
-        st.markdown(
-            f'<div style="background-color: #f0f2f6; padding: 20px; border-radius: 10px; border-left: 5px solid #1f77b4;">'
-            f'{response}'
-            f'</div>',
-            unsafe_allow_html=True
-        )
+        placeholder = st.empty()
+        response = ""
+        for delta in response_stream:
+            response += delta
+            render_answer(placeholder, response, fast_mode)
+    
+    processing_time = time.time() - start_time
+    
+    # Reuse formatted sources for the same query and sources on earlier searches
+    result_key = (query, tuple(node['node_id'] for node in search_results))
+    result = st.session_state.get('last_result')
+    if result is None or result['key'] != result_key:
+        sources_info = format_sources(search_results)
+        result = {
+            "key": result_key,
+            "query": query,
+            "sources": sources_info,
+            "sources_markdown": [format_source_markdown(source) for source in sources_info],
+            "stats": calculate_source_stats(sources_info)
+        }
+    result["response"] = response
+    result["fast_mode"] = fast_mode
+    result["processing_time"] = processing_time
+    st.session_state.last_result = result
+    
+    display_result_details(result)
+
+def display_cached_results(result: Dict):
+    """Redraw the last result without recomputing anything"""
+    
+    st.markdown("## 💬 Answer")
+    with st.container():
+        render_answer(st, result["response"], result["fast_mode"])
+    
+    display_result_details(result)
+
+def display_result_details(result: Dict):
+    """Display sources, statistics and export for a stored result"""
+    
+    sources_info = result["sources"]
+    stats = result["stats"]
+    query = result["query"]
+    response = result["response"]
+    processing_time = result["processing_time"]
     
     # Sources
     st.markdown("## 📚 Sources")
     
-    sources_info = format_sources(search_results)
-    
-    for i, source in enumerate(sources_info, 1):
+    for i, (source, source_markdown) in enumerate(zip(sources_info, result["sources_markdown"]), 1):
         with st.expander(f"📄 Source {i} (Relevance: {source['score']:.2f})"):
-            st.markdown("**Text fragment:**")
-            st.markdown(f'"{source["text"]}"')
-            
-            if source.get('metadata'):
-                st.markdown("**Metadata:**")
-                for key, value in source['metadata'].items():
-                    if value and value != 'Unknown':
-                        st.markdown(f"- **{key}:** {value}")
+            st.markdown(source_markdown)
     
     # Query statistics
     st.markdown("## 📊 Query Statistics")
@@ -226,32 +296,31 @@ def display_results(response: str, search_results: List, processing_time: float,
         st.metric("Processing time", f"{processing_time:.2f} sec")
     
     with col2:
-        st.metric("Sources found", len(search_results))
+        st.metric("Sources found", len(sources_info))
     
     with col3:
-        avg_score = sum(source['score'] for source in sources_info) / len(sources_info)
-        st.metric("Average relevance", f"{avg_score:.2f}")
+        st.metric("Average relevance", f"{stats['avg_score']:.2f}")
     
     with col4:
-        total_chars = sum(len(source['text']) for source in sources_info)
-        st.metric("Context volume", f"{total_chars} chars")
+        st.metric("Context volume", f"{stats['total_chars']} chars")
     
     # Export button
-    if st.button("📥 Export Result"):
-        export_data = {
-            "query": query,
-            "response": response,
-            "sources": sources_info,
-            "timestamp": datetime.now().isoformat(),
-            "processing_time": processing_time
-        }
-        
-        st.download_button(
-            label="Download JSON",
-            data=str(export_data),
-            file_name=f"research_qa_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-            mime="text/plain"
-        )
+    export_data = {
+        "query": query,
+        "response": response,
+        "sources": sources_info,
+        "timestamp": datetime.now().isoformat(),
+        "processing_time": processing_time
+    }
+    
+    payload = json.dumps(export_data, ensure_ascii=False, default=str).encode("utf-8")
+    
+    st.download_button(
+        label="📥 Export Result (JSON)",
+        data=payload,
+        file_name=f"research_qa_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        mime="application/json"
+    )
 
 if __name__ == "__main__":
     main()
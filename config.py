@@ -19,6 +19,21 @@ class AppConfig:
     DEFAULT_TOP_K = 3  # Default number of documents to retrieve
     MIN_SIMILARITY_SCORE = 0.1  # Minimum relevance threshold
     
+    # Local reranking (requires sentence-transformers)
+    ENABLE_RERANKING = False
+    RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-12-v2"  # ~1s over 50 chunks on CPU
+    RERANK_CANDIDATES = 50  # Candidates retrieved from LlamaCloud before reranking to top_k
+    RERANK_BATCH_SIZE = 32
+    
+    # Retrieval batching (coalesces concurrent users' queries; worth enabling above ~5 QPS)
+    ENABLE_RETRIEVAL_BATCHING = False
+    BATCH_MAX_SIZE = 8  # Maximum queries dispatched together
+    BATCH_MAX_WAIT = 0.02  # Maximum time to wait for a batch to fill (seconds)
+    
+    # Fast mode settings (retrieval-only answers, no LLM call)
+    FAST_MODE_SOURCES = 2  # Number of top fragments returned in fast mode
+    FAST_MODE_PREFIX = "**Most relevant fragments from the knowledge base:**"
+    
     # UI settings
     MAX_QUERY_LENGTH = 500  # Maximum query length
     MIN_QUERY_LENGTH = 10   # Minimum query length
@@ -39,9 +54,13 @@ class AppConfig:
     - Structure answers logically
     - Use scientific terminology
     - Be concise but informative
+    - Explain in clear, accessible language so the answer needs no rewriting
     """
     
-    QUERY_PROMPT_TEMPLATE = """
+    @staticmethod
+    def build_query_prompt(context: str, query: str) -> str:
+        """Build the user prompt; an f-string avoids re-parsing a template on every request"""
+        return f"""
     Context from scientific papers:
     {context}
     
@@ -79,26 +98,36 @@ class AppConfig:
         "Describe the main volatility clustering phenomena"
     ]
     
-    # Caching settings (for future use)
+    # Caching settings
     CACHE_TTL = 3600  # Cache lifetime in seconds (1 hour)
     ENABLE_CACHING = True
+    CACHE_DIR = ".streamlit/cache"  # On-disk cache location (persists across sessions)
+    ANSWER_CACHE_DIR = "answers"  # diskcache directory for generated responses
+    ANSWER_CACHE_SIZE_LIMIT = 64 * 1024 * 1024  # Maximum answer cache size in bytes
+    INDEX_CACHE_FILE = "index.json"  # Resolved LlamaCloud pipeline/project ids
+    INDEX_CACHE_TTL = 86400  # How long resolved index ids are trusted (seconds)
+    SECRETS_CACHE_TTL = 300  # How long parsed API keys are reused (seconds)
     
     # Limits
     MAX_DAILY_REQUESTS = 100  # Maximum requests per day
     REQUEST_TIMEOUT = 30  # API request timeout in seconds
     
+    # Shared HTTP connection pool (HTTP/2, reused by LlamaCloud and OpenAI)
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+    HTTP_MAX_CONNECTIONS = 64
+    
     # Response formatting
     MAX_RESPONSE_LENGTH = 2000  # Maximum response length in characters
     
     # Metadata fields to display
-    METADATA_FIELDS = [
+    METADATA_FIELDS = frozenset({
         'file_name',
         'page_label', 
         'title',
         'author',
         'creation_date',
         'document_type'
-    ]
+    })
     
     # Error handling
     MAX_RETRIES = 3  # Maximum number of retries for failed requests
@@ -1,41 +1,200 @@
 """
 Utility functions for Research Q/A Bot
+
+Heavy client libraries (LlamaIndex, OpenAI, httpx, NumPy, diskcache) are imported
+inside the functions that need them so the first page render stays fast.
 """
 
+from __future__ import annotations
+
 import streamlit as st
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterator, TYPE_CHECKING
 import logging
 from datetime import datetime
 import time
-
-# LlamaIndex imports
-from llama_index.indices.managed.llama_cloud import LlamaCloudIndex
-from llama_index.llms.openai import OpenAI
-from llama_index.core.schema import NodeWithScore
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import random
+import functools
+import math
+from concurrent.futures import Future
 
 from config import AppConfig
 
+if TYPE_CHECKING:
+    import diskcache
+    import httpx
+    from llama_index.indices.managed.llama_cloud import LlamaCloudIndex
+    from llama_index.llms.openai import OpenAI
+    from llama_index.core.schema import NodeWithScore
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound for a single backoff sleep in seconds
+MAX_RETRY_BACKOFF = 30
+
+# Display labels for metadata fields, e.g. 'file_name' -> 'File Name'
+_META_LABELS = {field: field.replace('_', ' ').title() for field in AppConfig.METADATA_FIELDS}
+
+# Query validation messages
+_QUERY_EMPTY_MESSAGE = "Query cannot be empty"
+_QUERY_TOO_SHORT_MESSAGE = f"Query too short. Minimum {AppConfig.MIN_QUERY_LENGTH} characters required"
+_QUERY_TOO_LONG_MESSAGE = f"Query too long. Maximum {AppConfig.MAX_QUERY_LENGTH} characters allowed"
+
+@st.cache_data(ttl=AppConfig.SECRETS_CACHE_TTL, show_spinner=False)
+def get_api_keys() -> Tuple[str, str]:
+    """
+    Read API keys from Streamlit secrets once and reuse them across reruns
+    
+    Returns:
+        Tuple[str, str]: (openai_api_key, llamacloud_api_key)
+        
+    Raises:
+        KeyError: If a required key is missing
+    """
+    api_keys = st.secrets["api_keys"]
+    return api_keys["openai_api_key"], api_keys["llamacloud_api_key"]
+
+def _http_limits() -> httpx.Limits:
+    """Connection pool limits for the shared HTTP clients"""
+    import httpx
+    
+    return httpx.Limits(
+        max_keepalive_connections=AppConfig.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        max_connections=AppConfig.HTTP_MAX_CONNECTIONS
+    )
+
+@st.cache_resource
+def get_http_client() -> httpx.Client:
+    """
+    Get the process-wide HTTP/2 client shared by LlamaCloud and OpenAI
+    
+    Returns:
+        httpx.Client: Shared client with keepalive connection pool
+    """
+    import httpx
+    
+    return httpx.Client(http2=True, timeout=AppConfig.REQUEST_TIMEOUT, limits=_http_limits())
+
+@st.cache_resource
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide async HTTP/2 client for LlamaCloud
+    
+    Only the retrieval batcher's long-lived event loop uses it; async
+    connections are bound to a single loop and must not cross asyncio.run calls.
+    
+    Returns:
+        httpx.AsyncClient: Shared async client with keepalive connection pool
+    """
+    import httpx
+    
+    return httpx.AsyncClient(http2=True, timeout=AppConfig.REQUEST_TIMEOUT, limits=_http_limits())
+
+def _index_cache_path() -> str:
+    """Path of the on-disk LlamaCloud index handle"""
+    return os.path.join(AppConfig.CACHE_DIR, AppConfig.INDEX_CACHE_FILE)
+
+def load_index_handle() -> Optional[Dict[str, str]]:
+    """
+    Load resolved LlamaCloud index ids persisted by a previous process
+    
+    Returns:
+        Optional[Dict]: pipeline_id and project_id, or None if missing, stale or for another index
+    """
+    path = _index_cache_path()
+    try:
+        if time.time() - os.path.getmtime(path) > AppConfig.INDEX_CACHE_TTL:
+            return None
+        with open(path, encoding="utf-8") as f:
+            handle = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    # Ignore handles resolved for a different index configuration
+    if (handle.get('name'), handle.get('project_name'), handle.get('organization_id')) != (
+        AppConfig.INDEX_NAME, AppConfig.PROJECT_NAME, AppConfig.ORGANIZATION_ID
+    ):
+        return None
+    
+    if not handle.get('pipeline_id'):
+        return None
+    return handle
+
+def save_index_handle(index: LlamaCloudIndex):
+    """
+    Persist resolved LlamaCloud index ids so later processes skip name lookup
+    
+    Args:
+        index: Index initialized by name
+    """
+    pipeline = getattr(index, 'pipeline', None)
+    project = getattr(index, 'project', None)
+    if pipeline is None:
+        logger.warning("LlamaCloudIndex has no resolved pipeline, index handle not persisted")
+        return
+    
+    handle = {
+        'name': AppConfig.INDEX_NAME,
+        'project_name': AppConfig.PROJECT_NAME,
+        'organization_id': AppConfig.ORGANIZATION_ID,
+        'pipeline_id': pipeline.id,
+        'project_id': getattr(project, 'id', None),
+    }
+    
+    try:
+        os.makedirs(AppConfig.CACHE_DIR, exist_ok=True)
+        with open(_index_cache_path(), "w", encoding="utf-8") as f:
+            json.dump(handle, f)
+    except OSError as e:
+        logger.warning(f"Failed to persist LlamaCloud index handle: {e}")
+
 @st.cache_resource
 def initialize_llamacloud_index() -> LlamaCloudIndex:
     """
-    Initialize LlamaCloud index with caching
+    Initialize LlamaCloud index with caching.
+    Reuses ids resolved by a previous process when available.
     
     Returns:
         LlamaCloudIndex: Initialized index
     """
+    from llama_index.indices.managed.llama_cloud import LlamaCloudIndex
+    
     try:
-        llamacloud_api_key = st.secrets["api_keys"]["llamacloud_api_key"]
+        _, llamacloud_api_key = get_api_keys()
+        client_kwargs = {
+            'organization_id': AppConfig.ORGANIZATION_ID,
+            'api_key': llamacloud_api_key,
+            'httpx_client': get_http_client(),
+            'async_httpx_client': get_async_http_client(),
+        }
+        
+        handle = load_index_handle()
+        if handle:
+            try:
+                index = LlamaCloudIndex(
+                    pipeline_id=handle['pipeline_id'],
+                    project_id=handle.get('project_id'),
+                    **client_kwargs
+                )
+                logger.info("LlamaCloud index initialized from persisted handle")
+                return index
+            except Exception as e:
+                if getattr(e, 'status_code', None) != 404:
+                    raise
+                logger.warning("Persisted LlamaCloud index handle not found, resolving by name")
         
         index = LlamaCloudIndex(
             name=AppConfig.INDEX_NAME,
             project_name=AppConfig.PROJECT_NAME,
-            organization_id=AppConfig.ORGANIZATION_ID,
-            api_key=llamacloud_api_key,
+            **client_kwargs
         )
+        save_index_handle(index)
         
         logger.info("LlamaCloud index successfully initialized")
         return index
@@ -44,9 +203,10 @@ def initialize_llamacloud_index() -> LlamaCloudIndex:
         logger.error(f"Error initializing LlamaCloud index: {e}")
         raise e
 
+@st.cache_resource(hash_funcs={float: lambda x: round(x, 2)})
 def initialize_openai_llm(temperature: float = AppConfig.DEFAULT_TEMPERATURE) -> OpenAI:
     """
-    Initialize OpenAI LLM
+    Initialize OpenAI LLM with caching per temperature
     
     Args:
         temperature: Temperature for response generation
@@ -54,15 +214,18 @@ def initialize_openai_llm(temperature: float = AppConfig.DEFAULT_TEMPERATURE) ->
     Returns:
         OpenAI: Initialized model
     """
+    from llama_index.llms.openai import OpenAI
+    
     try:
-        openai_api_key = st.secrets["api_keys"]["openai_api_key"]
+        openai_api_key, _ = get_api_keys()
         
         llm = OpenAI(
             model=AppConfig.DEFAULT_MODEL,
             temperature=temperature,
             max_tokens=AppConfig.MAX_TOKENS,
             api_key=openai_api_key,
-            system_prompt=AppConfig.SYSTEM_PROMPT
+            system_prompt=AppConfig.SYSTEM_PROMPT,
+            http_client=get_http_client()
         )
         
         logger.info(f"OpenAI LLM initialized with model {AppConfig.DEFAULT_MODEL}")
@@ -72,13 +235,205 @@ def initialize_openai_llm(temperature: float = AppConfig.DEFAULT_TEMPERATURE) ->
         logger.error(f"Error initializing OpenAI LLM: {e}")
         raise e
 
-def search_knowledge_base(
+class RetrievalBatcher:
+    """
+    Coalesce concurrent retrieval requests into batches
+    
+    Runs its own event loop in a daemon thread. Requests arriving within
+    BATCH_MAX_WAIT of each other (up to BATCH_MAX_SIZE) are dispatched
+    together over the index's async client.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = AppConfig.BATCH_MAX_SIZE,
+        max_wait: float = AppConfig.BATCH_MAX_WAIT
+    ):
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self._loop = asyncio.new_event_loop()
+        self._queue: Optional[asyncio.Queue] = None
+        # Strong references so pending tasks are not garbage-collected mid-flight
+        self._tasks: set = set()
+        self._ready = threading.Event()
+        threading.Thread(target=self._run_loop, name="retrieval-batcher", daemon=True).start()
+        self._ready.wait()
+    
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._queue = asyncio.Queue()
+        self._spawn(self._batcher())
+        self._ready.set()
+        self._loop.run_forever()
+    
+    def _spawn(self, coro):
+        task = self._loop.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def retrieve(self, index: LlamaCloudIndex, query: str, top_k: int) -> List[NodeWithScore]:
+        """
+        Submit a query and block until its batch has been retrieved
+        
+        Args:
+            index: LlamaCloud index
+            query: Search query
+            top_k: Number of documents to return
+            
+        Returns:
+            List[NodeWithScore]: Retrieved nodes
+        """
+        future: Future = Future()
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, (index, query, top_k, future))
+        return future.result(timeout=AppConfig.REQUEST_TIMEOUT)
+    
+    async def _batcher(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = self._loop.time() + self.max_wait
+            
+            # Keep collecting until the batch is full or the window closes
+            while len(batch) < self.max_size:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            logger.info(f"Dispatching retrieval batch of {len(batch)} queries")
+            self._spawn(self._dispatch(batch))
+    
+    async def _dispatch(self, batch: List[Tuple[LlamaCloudIndex, str, int, Future]]):
+        results = await asyncio.gather(
+            *(
+                index.as_retriever(similarity_top_k=top_k).aretrieve(query)
+                for index, query, top_k, _ in batch
+            ),
+            return_exceptions=True
+        )
+        for (_, _, _, future), result in zip(batch, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+@st.cache_resource
+def get_retrieval_batcher() -> RetrievalBatcher:
+    """
+    Get the process-wide retrieval batcher
+    
+    Returns:
+        RetrievalBatcher: Shared batcher instance
+    """
+    return RetrievalBatcher()
+
+@st.cache_resource(show_spinner=False)
+def load_reranker():
+    """
+    Load the local cross-encoder reranker
+    
+    Returns:
+        CrossEncoder: Loaded model, or None if sentence-transformers is not installed
+    """
+    try:
+        from sentence_transformers import CrossEncoder
+    except ImportError:
+        logger.warning("sentence-transformers is not installed, reranking disabled")
+        return None
+    
+    logger.info(f"Loading reranker {AppConfig.RERANK_MODEL}")
+    return CrossEncoder(AppConfig.RERANK_MODEL)
+
+def rerank_results(query: str, results: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Rerank retrieved documents with the local cross-encoder
+    
+    Args:
+        query: Search query
+        results: Retrieved documents
+        top_k: Number of documents to keep
+        
+    Returns:
+        List[Dict]: Top documents ordered by reranker score. 'score' keeps the
+        retrieval similarity; the raw cross-encoder output is stored as 'rerank_score'
+    """
+    reranker = load_reranker()
+    if reranker is None or not results:
+        return results[:top_k]
+    
+    scores = reranker.predict(
+        [(query, result['text']) for result in results],
+        batch_size=AppConfig.RERANK_BATCH_SIZE,
+        show_progress_bar=False
+    )
+    ranked = sorted(zip(scores, results), key=lambda pair: pair[0], reverse=True)[:top_k]
+    return [{**result, 'rerank_score': float(score)} for score, result in ranked]
+
+def _search(index: LlamaCloudIndex, query: str, top_k: int) -> List[Dict[str, Any]]:
+    """
+    Retrieve documents as plain dicts
+    
+    Args:
+        index: LlamaCloud index
+        query: Search query
+        top_k: Number of documents to return
+        
+    Returns:
+        List[Dict]: Documents above the relevance threshold (text, score, node_id, metadata)
+    """
+    logger.info(f"Performing search for query: '{query}' (top_k={top_k})")
+    
+    # Over-fetch candidates when they will be reranked locally
+    num_candidates = max(top_k, AppConfig.RERANK_CANDIDATES) if AppConfig.ENABLE_RERANKING else top_k
+    
+    # Perform search, coalescing with concurrent queries when batching is enabled
+    if AppConfig.ENABLE_RETRIEVAL_BATCHING:
+        nodes = get_retrieval_batcher().retrieve(index, query, num_candidates)
+    else:
+        retriever = index.as_retriever(similarity_top_k=num_candidates)
+        nodes = retriever.retrieve(query)
+    
+    # Filter by minimum relevance threshold
+    results = [
+        {
+            'text': node.text,
+            'score': node.score,
+            'node_id': node.node_id,
+            'metadata': dict(node.metadata or {})
+        }
+        for node in nodes
+        if node.score >= AppConfig.MIN_SIMILARITY_SCORE
+    ]
+    
+    if AppConfig.ENABLE_RERANKING:
+        results = rerank_results(query, results, top_k)
+    
+    return results
+
+@st.cache_data(ttl=AppConfig.CACHE_TTL, show_spinner=False)
+def _cached_search(_index: LlamaCloudIndex, query: str, top_k: int) -> List[Dict[str, Any]]:
+    """
+    Retrieve documents and cache them keyed on (query, top_k)
+    
+    Args:
+        _index: LlamaCloud index (underscore-prefixed so it is excluded from the cache key)
+        query: Search query
+        top_k: Number of documents to return
+        
+    Returns:
+        List[Dict]: Documents above the relevance threshold (text, score, node_id, metadata)
+    """
+    return _search(_index, query, top_k)
+
+async def search_knowledge_base(
     index: LlamaCloudIndex, 
     query: str, 
     top_k: int = AppConfig.DEFAULT_TOP_K
-) -> List[NodeWithScore]:
+) -> List[Dict[str, Any]]:
     """
-    Search for relevant documents in knowledge base
+    Search for relevant documents in knowledge base asynchronously
     
     Args:
         index: LlamaCloud index
@@ -86,77 +441,201 @@ def search_knowledge_base(
         top_k: Number of documents to return
         
     Returns:
-        List[NodeWithScore]: List of found documents with scores
+        List[Dict]: List of found documents with scores
     """
     try:
-        logger.info(f"Performing search for query: '{query}' (top_k={top_k})")
+        # Lookup runs in a worker thread so it still overlaps with other I/O;
+        # ENABLE_CACHING controls this layer as well as the answer cache
+        search = _cached_search if AppConfig.ENABLE_CACHING else _search
+        results = await asyncio.to_thread(search, index, query, top_k)
         
-        # Get retriever
-        retriever = index.as_retriever(similarity_top_k=top_k)
+        logger.info(f"Found {len(results)} relevant documents")
+        return results
         
-        # Perform search
-        nodes = retriever.retrieve(query)
+    except Exception as e:
+        logger.error(f"Error searching knowledge base: {e}")
+        raise e
+
+async def prepare_search(
+    index: LlamaCloudIndex,
+    query: str,
+    top_k: int = AppConfig.DEFAULT_TOP_K,
+    temperature: float = AppConfig.DEFAULT_TEMPERATURE,
+    fast_mode: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[OpenAI]]:
+    """
+    Run knowledge base search and OpenAI initialization concurrently
+    
+    Args:
+        index: LlamaCloud index
+        query: Search query
+        top_k: Number of documents to return
+        temperature: Temperature for response generation
+        fast_mode: Skip OpenAI initialization for retrieval-only answers
         
-        # Filter by minimum relevance threshold
-        filtered_nodes = [
-            node for node in nodes 
-            if node.score >= AppConfig.MIN_SIMILARITY_SCORE
-        ]
+    Returns:
+        Tuple[List[Dict], Optional[OpenAI]]: (filtered search results, initialized model or None in fast mode)
+    """
+    if fast_mode:
+        return await search_knowledge_base(index, query, top_k=top_k), None
+    
+    nodes, llm = await asyncio.gather(
+        search_knowledge_base(index, query, top_k=top_k),
+        asyncio.to_thread(initialize_openai_llm, temperature),
+    )
+    return nodes, llm
+
+def answer_cache_key(
+    prompt: str,
+    temperature: float,
+    model: str,
+    search_results: List[Dict[str, Any]]
+) -> str:
+    """
+    Build answer cache key from the full prompt, generation settings and retrieved context
+    
+    The system prompt and the built user prompt are both hashed, so any prompt or
+    context-format change invalidates answers persisted by earlier versions.
+    
+    Args:
+        prompt: Built user prompt sent to the LLM
+        temperature: Temperature used for generation
+        model: OpenAI model name
+        search_results: Search results used as context
         
-        logger.info(f"Found {len(filtered_nodes)} relevant documents")
-        return filtered_nodes
+    Returns:
+        str: Hex digest identifying the answer
+    """
+    context_hash = hashlib.blake2b(
+        "|".join(node['node_id'] for node in search_results).encode(),
+        digest_size=16
+    ).hexdigest()
+    key = hashlib.blake2b(digest_size=16)
+    for part in (
+        f"{temperature:.2f}|{model}|{AppConfig.MAX_TOKENS}|{context_hash}",
+        AppConfig.SYSTEM_PROMPT,
+        prompt,
+    ):
+        key.update(part.encode())
+        key.update(b"\0")
+    return key.hexdigest()
+
+@st.cache_resource
+def get_answer_cache() -> diskcache.Cache:
+    """
+    Open the on-disk answer cache shared by all sessions and processes
+    
+    Expired entries are culled on writes and the total size is capped at
+    ANSWER_CACHE_SIZE_LIMIT, evicting least recently stored answers first.
+    
+    Returns:
+        diskcache.Cache: Thread- and process-safe cache
+    """
+    import diskcache
+    
+    return diskcache.Cache(
+        os.path.join(AppConfig.CACHE_DIR, AppConfig.ANSWER_CACHE_DIR),
+        size_limit=AppConfig.ANSWER_CACHE_SIZE_LIMIT,
+        eviction_policy="least-recently-stored"
+    )
+
+def get_cached_answer(key: str) -> Optional[str]:
+    """
+    Look up a previously generated answer in the on-disk cache
+    
+    Args:
+        key: Answer cache key
         
+    Returns:
+        Optional[str]: Cached answer, or None if missing or expired
+    """
+    if not AppConfig.ENABLE_CACHING:
+        return None
+    
+    try:
+        return get_answer_cache().get(key)
     except Exception as e:
-        logger.error(f"Error searching knowledge base: {e}")
-        raise e
+        logger.warning(f"Answer cache unavailable: {e}")
+        return None
+
+def store_answer(key: str, text: str):
+    """
+    Write a generated answer to the on-disk cache
+    
+    Args:
+        key: Answer cache key
+        text: Full generated answer
+    """
+    if not AppConfig.ENABLE_CACHING or not text:
+        return
+    
+    try:
+        get_answer_cache().set(key, text, expire=AppConfig.CACHE_TTL)
+    except Exception as e:
+        logger.warning(f"Failed to cache answer: {e}")
 
 def structure_response(
-    llm: OpenAI, 
+    llm: Optional[OpenAI], 
     query: str, 
-    search_results: List[NodeWithScore]
-) -> str:
+    search_results: List[Dict[str, Any]],
+    fast_mode: bool = False
+) -> Iterator[str]:
     """
-    Structure response using OpenAI
+    Structure response using OpenAI, streaming tokens as they arrive.
+    Answers for identical query, settings and context are served from cache.
     
     Args:
-        llm: OpenAI model
+        llm: OpenAI model (unused in fast mode)
         query: Original user query
         search_results: Search results from index
+        fast_mode: Return top fragments directly without calling the LLM
         
-    Returns:
-        str: Structured response
+    Yields:
+        str: Next chunk of the structured response
     """
+    if fast_mode:
+        fragments = "\n\n".join(
+            node['text'] for node in search_results[:AppConfig.FAST_MODE_SOURCES]
+        )
+        yield f"{AppConfig.FAST_MODE_PREFIX}\n\n{fragments}"
+        return
+    
     try:
-        # Prepare context from found documents
-        context_parts = []
-        for i, node in enumerate(search_results, 1):
-            context_part = f"""
-Source {i} (relevance: {node.score:.2f}):
-{node.text}
----"""
-            context_parts.append(context_part)
-        
-        context = "\n".join(context_parts)
+        # Prepare context from found documents, one compact line per source
+        context = "\n".join(
+            f"[Source {i} score={node['score']:.2f}] {node['text']}"
+            for i, node in enumerate(search_results, 1)
+        )
         
         # Format prompt
-        prompt = AppConfig.QUERY_PROMPT_TEMPLATE.format(
-            context=context,
-            query=query
-        )
+        prompt = AppConfig.build_query_prompt(context=context, query=query)
+        
+        cache_key = answer_cache_key(prompt, llm.temperature, llm.model, search_results)
+        cached = get_cached_answer(cache_key)
+        if cached is not None:
+            logger.info("Response served from answer cache")
+            yield cached
+            return
         
         logger.info("Sending request to OpenAI for response structuring")
         
-        # Get response from LLM
-        response = llm.complete(prompt)
+        # Stream response from LLM
+        response_parts = []
+        for chunk in llm.stream_complete(prompt):
+            delta = chunk.delta or ""
+            response_parts.append(delta)
+            yield delta
         
         logger.info("Response successfully received from OpenAI")
-        return response.text
+        
+        # Write-through so the next identical request skips the LLM
+        store_answer(cache_key, "".join(response_parts))
         
     except Exception as e:
         logger.error(f"Error structuring response: {e}")
         raise e
 
-def format_sources(search_results: List[NodeWithScore]) -> List[Dict[str, Any]]:
+def format_sources(search_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Format source information
     
@@ -170,21 +649,21 @@ def format_sources(search_results: List[NodeWithScore]) -> List[Dict[str, Any]]:
     
     for node in search_results:
         source_info = {
-            'text': node.text,
-            'score': node.score,
-            'node_id': node.node_id,
+            'text': node['text'],
+            'score': node['score'],
+            'node_id': node['node_id'],
             'metadata': {}
         }
         
         # Extract metadata if available
-        if hasattr(node, 'metadata') and node.metadata:
-            metadata = node.metadata
+        if node.get('metadata'):
+            metadata = node['metadata']
             
-            # Extract standard metadata fields
+            # Extract standard metadata fields, dropping empty values
             source_info['metadata'] = {
-                field: metadata.get(field, 'Unknown')
-                for field in AppConfig.METADATA_FIELDS
-                if field in metadata
+                field: value
+                for field, value in metadata.items()
+                if field in AppConfig.METADATA_FIELDS and value and value != 'Unknown'
             }
         
         sources.append(source_info)
@@ -201,14 +680,16 @@ def validate_query(query: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: (is_valid, error_message)
     """
-    if not query or not query.strip():
-        return False, "Query cannot be empty"
+    length = len(query.strip()) if query else 0
+    
+    if not length:
+        return False, _QUERY_EMPTY_MESSAGE
     
-    if len(query.strip()) < AppConfig.MIN_QUERY_LENGTH:
-        return False, f"Query too short. Minimum {AppConfig.MIN_QUERY_LENGTH} characters required"
+    if length < AppConfig.MIN_QUERY_LENGTH:
+        return False, _QUERY_TOO_SHORT_MESSAGE
     
-    if len(query.strip()) > AppConfig.MAX_QUERY_LENGTH:
-        return False, f"Query too long. Maximum {AppConfig.MAX_QUERY_LENGTH} characters allowed"
+    if length > AppConfig.MAX_QUERY_LENGTH:
+        return False, _QUERY_TOO_LONG_MESSAGE
     
     return True, ""
 
@@ -225,9 +706,10 @@ def log_query(query: str, processing_time: float, num_results: int):
                 f"Time: {processing_time:.2f}s | "
                 f"Results: {num_results}")
 
+@functools.lru_cache(maxsize=512)
 def truncate_text(text: str, max_length: int = 200) -> str:
     """
-    Truncate text to specified length
+    Truncate text to specified length, memoized across reruns
     
     Args:
         text: Text to truncate
@@ -253,12 +735,35 @@ def format_metadata_display(metadata: Dict[str, Any]) -> str:
     formatted_items = []
     for key, value in metadata.items():
         if value and value != 'Unknown':
-            formatted_key = key.replace('_', ' ').title()
+            formatted_key = _META_LABELS.get(key) or key.replace('_', ' ').title()
             formatted_items.append(f"**{formatted_key}:** {value}")
     
     return "\n".join(formatted_items) if formatted_items else "No metadata available"
 
-def calculate_avg_relevance(search_results: List[NodeWithScore]) -> float:
+def format_source_markdown(source: Dict[str, Any]) -> str:
+    """
+    Render a source as a single Markdown block
+    
+    Text stays Markdown so formulas in paper fragments (e.g. $\\sigma^2$) still render.
+    
+    Args:
+        source: Formatted source information (see format_sources)
+        
+    Returns:
+        str: Markdown with the text fragment and metadata list
+    """
+    parts = ["**Text fragment:**", f'"{source["text"]}"']
+    
+    if source.get('metadata'):
+        parts.append("**Metadata:**")
+        parts.append("\n".join(
+            f"- **{_META_LABELS[key]}:** {value}"
+            for key, value in source['metadata'].items()
+        ))
+    
+    return "\n\n".join(parts)
+
+def calculate_avg_relevance(search_results: List[Dict[str, Any]]) -> float:
     """
     Calculate average relevance score
     
@@ -268,15 +773,71 @@ def calculate_avg_relevance(search_results: List[NodeWithScore]) -> float:
     Returns:
         float: Average relevance score
     """
-    if not search_results:
-        return 0.0
+    return calculate_source_stats(search_results)['avg_score']
+
+def calculate_source_stats(sources: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Calculate relevance and context statistics in a single pass
+    
+    Args:
+        sources: List of sources with 'score' and 'text'
+        
+    Returns:
+        Dict: avg_score (mean relevance) and total_chars (context volume)
+    """
+    if not sources:
+        return {'avg_score': 0.0, 'total_chars': 0}
+    
+    import numpy as np
+    
+    count = len(sources)
+    scores = np.fromiter((source['score'] for source in sources), dtype=np.float32, count=count)
+    lengths = np.fromiter((len(source['text']) for source in sources), dtype=np.int32, count=count)
+    
+    return {
+        'avg_score': float(scores.mean()),
+        'total_chars': int(lengths.sum())
+    }
+
+@functools.lru_cache(maxsize=None)
+def transient_errors() -> Tuple[type, ...]:
+    """
+    Errors worth retrying; anything else (auth, bad request) is re-raised immediately
+    
+    Returns:
+        Tuple[type, ...]: OpenAI exception classes for transient failures
+    """
+    from openai import RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+    
+    return (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Extract server-requested delay from a Retry-After header
+    
+    Args:
+        error: Exception raised by the API client
+        
+    Returns:
+        Optional[float]: Non-negative delay in seconds, or None if missing or invalid
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    
+    try:
+        retry_after = float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
     
-    total_score = sum(node.score for node in search_results)
-    return total_score / len(search_results)
+    if not math.isfinite(retry_after):
+        return None
+    return max(0.0, retry_after)
 
 def retry_operation(func, max_retries: int = AppConfig.MAX_RETRIES, delay: float = AppConfig.RETRY_DELAY):
     """
-    Retry operation with exponential backoff
+    Retry transient API failures with full-jitter exponential backoff
     
     Args:
         func: Function to retry
@@ -289,10 +850,13 @@ def retry_operation(func, max_retries: int = AppConfig.MAX_RETRIES, delay: float
     for attempt in range(max_retries):
         try:
             return func()
-        except Exception as e:
+        except transient_errors() as e:
             if attempt == max_retries - 1:
                 raise e
-            time.sleep(delay * (2 ** attempt))
-            logger.warning(f"Retry attempt {attempt + 1} for operation")
+            backoff = _retry_after(e)
+            if backoff is None:
+                backoff = random.uniform(0, min(delay * (2 ** attempt), MAX_RETRY_BACKOFF))
+            logger.warning(f"Retry attempt {attempt + 1} for operation in {backoff:.2f}s: {e}")
+            time.sleep(min(backoff, MAX_RETRY_BACKOFF))
     
     return None